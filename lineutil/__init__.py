@@ -1,5 +1,6 @@
 
 from . import colormap
 from .style import *
+from .export import save_figure_async, wait_saves, set_background_saving
 from .presets import preset_nature, preset_prl
 from .data import *
\ No newline at end of file
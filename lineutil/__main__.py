@@ -7,52 +7,107 @@ import sys
 import matplotlib.pyplot as plt
 import numpy as np
 import os.path
+from typing import Optional
+from matplotlib.lines import Line2D
 from . import colormap
 from . import style
+from .export import save_figure_async
+from .data import read_dat, sample_dat, detect_format, read_columns, get_columns
 
-def parse_cols1(x, data):
-    try:
-        v = int(x)
-    except ValueError:
-        xcol = data.loc[:, x]
-        xtitle = x
-    else:
-        if v == 0:
-            xcol = data.index
-        else:
-            xcol = data.iloc[:, v-1]
-            xtitle = data.columns[v-1]
-
-    return xcol, xtitle
-
-def parse_cols(x:str, y:str, data:pd.DataFrame):
-    # x: a single number or string
-    # y: x or number:number or x,x,...x
-    # returns x, ys, xtitle, ytitles
-    
-    xcol, xtitle = parse_cols1(x, data)
+def parse_col_ids(x:str, y:str, titles:list):
+    """ Find the positions of x and y columns given all column titles. Position `None` means the index.
+    x: A single number (starting from 1, and 0 for the index) or title.
+    y: Same as x, or number:number, or x,x,...x
+    """
+    def _col_id(s):
+        try:
+            v = int(s)
+        except ValueError:
+            return titles.index(s)
+        return None if v == 0 else v-1
     
+    xid = _col_id(x)
     if ':' in y:
         start, end = y.split(':')
         vstart = 0 if start == '' else int(start)-1
-        vend = data.shape[1] if end == '' else int(end)-1
-        ycol = data.iloc[:, vstart:vend]
-        ytitle = [x for x in data.columns[vstart:vend]]
-
+        vend = len(titles) if end == '' else int(end)-1
+        yids = list(range(len(titles)))[vstart:vend]
     else:
-        cols = []
-        titles = []
-        for y_ in y.split(','):
-            ycol_, ytitle_ = parse_cols1(y_, data)
-            cols.append(ycol_)
-            titles.append(ytitle_)
+        yids = [_col_id(y_) for y_ in y.split(',')]
+
+    return xid, yids
+
 
-        ycol = pd.DataFrame(dict(zip(titles, cols)))
-        ytitle = titles
+def parse_cols(x:str, y:str, data:pd.DataFrame):
+    """ Select x and y columns (see `parse_col_ids()`) of data.
+    Returns x (1D array), ys (list of 1D arrays), xtitle, ytitles.
+    Column arrays are views of data whenever possible (see `get_columns()`).
+    """
+    titles = list(data.columns)
+    xid, yids = parse_col_ids(x, y, titles)
 
-    return xcol, ycol, xtitle, ytitle
+    xcol = get_columns(data, [xid])[0]
+    ycol = get_columns(data, yids)
+    title = lambda i: titles[i] if i is not None else str(data.index.name or 'index')
+    return xcol, ycol, title(xid), [title(i) for i in yids]
         
 
+def resolve_cols(x:str, y:str, titles:list):
+    """ Find the columns needed by x and y (see `parse_col_ids()`), given all column titles.
+    Returns (usecols, x, y), where the new x and y refer to the columns in `usecols`.
+    """
+    xid, yids = parse_col_ids(x, y, titles)
+    needed = list(dict.fromkeys(i for i in [xid] + yids if i is not None))
+    pos = {i: str(j+1) for j, i in enumerate(needed)}
+    return [titles[i] for i in needed], pos.get(xid, '0'), ','.join(pos.get(i, '0') for i in yids)
+
+
+def iter_cols(file, x:str, y:str, sep:str, chunksize:int=1000000, **kwargs):
+    """ Read a file by chunks, and yields the selected (x, ys) of each chunk, where ys is a 2D array of (nrows, ncols).
+    """
+    for data in read_dat(file, sep=sep, chunksize=chunksize, **kwargs):
+        xcol, ycol, _, _ = parse_cols(x, y, data)
+        yield xcol, np.column_stack(ycol)
+
+
+def watch_files(files:list, callback, interval:float=0.5, debounce:Optional[float]=None):
+    """ Poll the stat of files, and calls `callback(indices)` with the indices of changed files. 
+    A change is reported only after the file stays the same for `debounce` seconds (defaults to `interval`),
+    so a burst of writes triggers only one call. Returns when the current figure is closed.
+    """
+    import time
+
+    def _stat(f):
+        try:
+            st = os.stat(f)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    if debounce is None:
+        debounce = interval
+
+    fig = plt.gcf()
+    last = {f: _stat(f) for f in files}
+    pending = {}    # file -> (stat, time of last change)
+    try:
+        while plt.fignum_exists(fig.number):
+            plt.pause(interval)     # also processes the GUI events
+            now = time.monotonic()
+            for f in last:
+                st = _stat(f)
+                if st != pending.get(f, (last[f],))[0]:
+                    pending[f] = (st, now)
+
+            ready = [f for f, (st, t) in pending.items() if now - t >= debounce and st is not None]
+            if ready:
+                for f in ready:
+                    last[f] = pending.pop(f)[0]
+                callback([n for n, f in enumerate(files) if f in ready])
+    except KeyboardInterrupt:
+        pass
+
+
 def parse_token(token:str):
     """ Parse string into one of int,float,bool,None,str.
     """
@@ -87,6 +142,14 @@ def parse_range(s):
     p, q = s.split(':', 1)
     return (float(p) if p else None, float(q) if q else None)
 
+def parse_size(s):
+    """ Parse size like "16M" into number of bytes.
+    """
+    units = {'K':1<<10, 'M':1<<20, 'G':1<<30}
+    if s[-1].upper() in units:
+        return int(float(s[:-1]) * units[s[-1].upper()])
+    return int(s)
+
 def parse_bool(s):
     return {'true':True, 'false':False}[s.lower()]
 
@@ -103,16 +166,22 @@ def main():
     parser.add_argument('--sep', default='\s+', help='Separator of the input file')
     parser.add_argument('--append', action='store_true', default=False, help='Treat line properties of different files all at the same cycle')
     # parser.add_argument('--overlay', choices=['direct', 'subplot'], default='direct') # direct/subplot/figure
-    parser.add_argument('--save', help='Filename (if save)')
+    parser.add_argument('--save', action='append', help='Filename (if save). May be repeated to save multiple formats at once, e.g. "--save a.png --save a.pdf"')
+    parser.add_argument('--concurrent', action='store_true', default=False, help='Write multiple --save outputs concurrently')
     parser.add_argument('--xlabel', help='Label of x axis')
     parser.add_argument('--ylabel', help='Label of y axis')
     parser.add_argument('--xlim', help='Range of x in the format "start:end"')
+    parser.add_argument('--preview', nargs='?', const='16M', help='Quick preview of large files. Reads at most this many bytes (default 16M) of rows, sampled evenly across each file')
+    parser.add_argument('--preview-time', type=float, help='With --preview, the maximum time (seconds) spent in reading each file')
+    parser.add_argument('--watch', nargs='?', type=float, const=0.5, help='Keep the figure open, and replot the files that changed. The optional value is the polling interval (seconds)')
+    parser.add_argument('--index', action='store_true', default=False, help='With --xlim, only read the rows inside the range, using an index of the (monotonic) x column saved next to the file')
     parser.add_argument('--ylim', help='Range of y in the format "start:end"')
     parser.add_argument('--log', choices=['x','y','all'], help='Use log plotting')
+    parser.add_argument('--density', action='store_true', default=False, help='Plot the points as a density image instead of lines/markers. Suitable for millions of points')
     parser.add_argument('--dpi', type=int, help='DPI')
     parser.add_argument('--aspect', type=float, help='Aspect of the subplots')
     parser.add_argument('--title', help='Title of the figure')
-    parser.add_argument('--legend', help='Legend and legend arguments', type=str, default='True')
+    parser.add_argument('--legend', help='Legend and legend arguments, e.g. "loc=fast,max_vertices=10000"', type=str, default='True')
     parser.add_argument('files', nargs='+')
 
     args = parser.parse_args()
@@ -186,7 +255,7 @@ def main():
                     marker_colormap = 'line.lighter'
                 else:
                     colors = style.get_colors(colormaps[n])
-                    marker_colormap = [style.lighten_color(*c[:3]) for c in (colors[1:] if colormaps[n].startswith('line.') else colors)]
+                    marker_colormap = style.lighten_colors(colors[1:] if colormaps[n].startswith('line.') else colors).tolist()
         else:
             marker_colormap = args.markercolormap
         
@@ -230,18 +299,79 @@ def main():
 
     # Plotting
 
-    xtitles = set()
-    ytitles = set()
-    for n, file in enumerate(files):
-        data = pd.read_csv(file, sep=args.sep, index_col=False)
-        xcol, ycol, xtitle, ytitle = parse_cols(args.x[n], args.y[n], data)
+    if args.density:
+        plt.xscale('log' if args.log in ('x', 'all') else 'linear')
+        plt.yscale('log' if args.log in ('y', 'all') else 'linear')
+
+    def plot_file(n:int, props:Optional[list]=None):
+        """ Plot the n-th file. Returns the artists created, xtitle, ytitle and the preview fraction.
+        props: Line properties (color, markerfacecolor) of the artists to replace, which keeps the colors in replotting.
+        """
+        file = files[n]
+        artists0 = set(plt.gca().get_children())
+        preview_fraction = None
+
+        # binary files: only read the selected columns
+        if detect_format(file) is not None:
+            usecols, x, y = resolve_cols(args.x[n], args.y[n], read_columns(file))
+        else:
+            usecols, x, y = None, args.x[n], args.y[n]
+
+        if args.preview:
+            data = sample_dat(file, max_bytes=parse_size(args.preview), max_time=args.preview_time, sep=args.sep, usecols=usecols)
+            preview_fraction = data.attrs['preview']
 
-        if n == 0 or not args.append:
+        if (n == 0 or not args.append) and props is None:
             style.set_prop_cycle(colormap=colormaps[n], marker_colormap=marker_colormaps[n])
 
-        for j in range(ycol.shape[1]):
-            plotfunc = {None:plt.plot, 'x':plt.semilogx, 'y':plt.semilogy, 'all':plt.loglog}[args.log]
-            plotfunc(xcol, ycol.iloc[:,j], label=fileprefix[n] + ytitle[j], **styles[n if not args.append else 0])
+        if args.density:
+            # streamed by chunks, so the data does not need to fit in memory
+            if args.preview:
+                chunks = lambda: [(xcol, np.column_stack(ycol)) for xcol, ycol, _, _ in [parse_cols(x, y, data)]]
+            else:
+                chunks = lambda: iter_cols(file, x, y, args.sep, usecols=usecols)
+
+            _, _, xtitle, ytitle = parse_cols(x, y, read_dat(file, sep=args.sep, nrows=0, usecols=usecols))
+
+            xlim = parse_range(args.xlim) if args.xlim else (None, None)
+            ylim = parse_range(args.ylim) if args.ylim else (None, None)
+            if None in xlim + ylim:
+                xlim0, ylim0 = style.get_density_extent(chunks(), plt.gca().get_xscale(), plt.gca().get_yscale())
+                xlim = tuple(d if v is None else v for v, d in zip(xlim, xlim0))
+                ylim = tuple(d if v is None else v for v, d in zip(ylim, ylim0))
+
+            color = styles[n if not args.append else 0].get('color')
+            if props:
+                color = [props[min(j, len(props)-1)]['color'] for j in range(len(ytitle))]
+            style.plot_density(chunks(), xlim=xlim, ylim=ylim, color=color, label=[fileprefix[n] + t for t in ytitle])
+
+        else:
+            if args.preview:
+                pass
+            elif args.xlim and args.index and x != '0':
+                data = read_dat(file, sep=args.sep, xrange=parse_range(args.xlim), xcol=x, usecols=usecols)
+            else:
+                data = read_dat(file, sep=args.sep, usecols=usecols)
+            xcol, ycol, xtitle, ytitle = parse_cols(x, y, data)
+
+            for j in range(len(ycol)):
+                plotfunc = {None:plt.plot, 'x':plt.semilogx, 'y':plt.semilogy, 'all':plt.loglog}[args.log]
+                style_ = styles[n if not args.append else 0]
+                if props and j < len(props):
+                    style_ = dict(props[j], **style_)
+                plotfunc(xcol, ycol[j], label=fileprefix[n] + ytitle[j], **style_)
+
+        artists = [a for a in plt.gca().get_children() if a not in artists0]
+        return artists, xtitle, ytitle, preview_fraction
+
+    xtitles = set()
+    ytitles = set()
+    preview_fractions = []
+    file_artists = []
+    for n in range(len(files)):
+        artists, xtitle, ytitle, preview_fraction = plot_file(n)
+        file_artists.append(artists)
+        preview_fractions.append(preview_fraction)
 
         xtitles.add(xtitle)
         if len(ytitle) == 1:
@@ -263,13 +393,49 @@ def main():
     elif args.ylabel is not None:
         plt.ylabel(args.ylabel)
 
-    if args.title:
+    if args.preview:
+        # marks the figure as a preview
+        known = [f for f in preview_fractions if f is not None]
+        mark = '[preview: %.2g%% of data]' % (100 * min(known)) if len(known) == len(preview_fractions) else '[preview: head of data]'
+        if len(known) < len(preview_fractions) or min(known) < 1:
+            plt.title(args.title + ' ' + mark if args.title else mark)
+        elif args.title:
+            plt.title(args.title)
+    elif args.title:
         plt.title(args.title)
 
     if legend:
         style.legend(**legend_style)
 
-    style.render_resized(filename=args.save, dpi=args.dpi, aspect=args.aspect) 
+    if args.watch:
+        plt.ion()
+
+    style.render_resized(filename=args.save, dpi=args.dpi, aspect=args.aspect, concurrent=args.concurrent)
+
+    if args.watch:
+        def replot(changed:list):
+            for n in changed:
+                props = [{'color':a.get_color(), 'markerfacecolor':a.get_markerfacecolor()} for a in file_artists[n] if isinstance(a, Line2D)]
+                for a in file_artists[n]:
+                    a.remove()
+                file_artists[n] = plot_file(n, props)[0]
+
+            plt.gca().relim()
+            plt.gca().autoscale_view()
+            if legend:  # keeps the order of files
+                handles = [a for artists in file_artists for a in artists if isinstance(a, Line2D) and not a.get_label().startswith('_')]
+                style.legend(handles, [h.get_label() for h in handles], **legend_style)
+
+            plt.gcf().canvas.draw_idle()
+            if args.save:
+                save_figure_async(plt.gcf(), args.save, dpi=args.dpi).add_done_callback(report_save)
+
+        def report_save(job):
+            # the figure keeps being watched, so errors are reported rather than raised
+            if job.exception() is not None:
+                print('Saving %s failed: %r' % (', '.join(args.save), job.exception()), file=sys.stderr)
+
+        watch_files(files, replot, interval=args.watch)
     
 
 if __name__ == '__main__':
@@ -1,23 +1,655 @@
 
+import io
+import os
+import re
+import queue
+import threading
+from typing import Optional, Union
+
 import pandas as pd
 import numpy as np
 
 
-def read_dat(filepath_or_buffer, **kwargs):
+_magics = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+    (b'BZh', 'bz2'),
+)
+
+
+def detect_compression(filepath):
+    """ Detect the compression of a file by magic bytes. Returns one of 'gzip'/'xz'/'zstd'/'bz2', or `None`.
+    """
+    with open(filepath, 'rb') as f:
+        header = f.read(6)
+    for magic, method in _magics:
+        if header.startswith(magic):
+            return method
+    return None
+
+
+_format_magics = (
+    (b'\x93NUMPY', 'npy'),
+    (b'PK\x03\x04', 'npz'),
+    (b'\x89HDF\r\n\x1a\n', 'hdf5'),
+    (b'PAR1', 'parquet'),
+    (b'ARROW1', 'feather'),
+)
+
+
+def detect_format(filepath):
+    """ Detect binary file format by magic bytes. Returns one of 'npy'/'npz'/'hdf5'/'parquet'/'feather', or `None` for text files.
+    """
+    with open(filepath, 'rb') as f:
+        header = f.read(8)
+    for magic, fmt in _format_magics:
+        if header.startswith(magic):
+            return fmt
+    return None
+
+
+def _array_titles(dtype, shape:tuple):
+    if dtype.names:
+        return list(dtype.names)
+    return ['col%d' % (j+1) for j in range(1 if len(shape) == 1 else shape[1])]
+
+
+def _read_npy_header(fp):
+    """ Read the header of npy data from a file object. Returns (shape, fortran_order, dtype).
+    """
+    version = np.lib.format.read_magic(fp)
+    if version == (1, 0):
+        return np.lib.format.read_array_header_1_0(fp)
+    else:
+        return np.lib.format.read_array_header_2_0(fp)
+
+
+def _npz_header(f, name:str):
+    """ Get (shape, dtype) of an array in a npz file, without decompressing the data.
+    """
+    with f.zip.open(name + '.npy') as fp:
+        shape, _, dtype = _read_npy_header(fp)
+    return shape, dtype
+
+
+def _npz_mmap(filepath, f, name:str):
+    """ Memory map an array in a npz file. Only possible if it is stored without compression (`np.savez()`); 
+    returns `None` otherwise.
+    """
+    import zipfile
+    import struct
+
+    info = f.zip.getinfo(name + '.npy')
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+    with open(filepath, 'rb') as fp:
+        fp.seek(info.header_offset)
+        namelen, extralen = struct.unpack('<HH', fp.read(30)[26:30])     # the local file header
+        fp.seek(info.header_offset + 30 + namelen + extralen)
+        shape, fortran_order, dtype = _read_npy_header(fp)
+        offset = fp.tell()
+    if dtype.hasobject:
+        return None
+    return np.memmap(filepath, dtype=dtype, mode='r', offset=offset, shape=shape, order='F' if fortran_order else 'C')
+
+
+def _npz_head(f, name:str, nrows:int):
+    """ Read the first rows of a (C ordered) array in a npz file, decompressing only them.
+    """
+    with f.zip.open(name + '.npy') as fp:
+        shape, fortran_order, dtype = _read_npy_header(fp)
+        if fortran_order and len(shape) > 1:
+            return f[name][:nrows]
+        n = min(nrows, shape[0])
+        count = n * int(np.prod(shape[1:]))
+        return np.frombuffer(fp.read(count * dtype.itemsize), dtype=dtype).reshape((n,) + shape[1:])
+
+
+def _npz_single_array(f):
+    """ Whether a npz file holds a single 2D (or structured) array, whose columns are used.
+    """
+    if len(f.files) != 1:
+        return False
+    shape, dtype = _npz_header(f, f.files[0])
+    return len(shape) > 1 or dtype.names is not None
+
+
+def _array_columns(arr, usecols:Optional[list]):
+    """ Columns of an array (structured, 1D or 2D) as views.
+    """
+    all_titles = _array_titles(arr.dtype, arr.shape)
+    cols = {}
+    for t in (usecols if usecols is not None else all_titles):
+        if arr.dtype.names:
+            cols[t] = arr[t]
+        elif arr.ndim == 1:
+            cols[t] = arr
+        else:
+            cols[t] = arr[:, all_titles.index(t)]
+    return cols
+
+
+def read_columns(filepath, **kwargs):
+    """ Get the column titles of a file, without reading the data. Columns of plain arrays are named "col1", "col2", ...
+    """
+    fmt = detect_format(filepath)
+    if fmt == 'npy':
+        arr = np.load(filepath, mmap_mode='r')
+        return _array_titles(arr.dtype, arr.shape)
+    elif fmt == 'npz':
+        with np.load(filepath) as f:
+            if _npz_single_array(f):
+                shape, dtype = _npz_header(f, f.files[0])
+                return _array_titles(dtype, shape)
+            return list(f.files)
+    elif fmt == 'parquet':
+        import pyarrow.parquet
+        return pyarrow.parquet.read_schema(filepath).names
+    elif fmt == 'feather':
+        import pyarrow
+        with pyarrow.memory_map(os.fspath(filepath)) as source:
+            return pyarrow.ipc.open_file(source).schema.names
+    elif fmt == 'hdf5':
+        with pd.HDFStore(filepath, 'r') as store:
+            return list(_read_hdf(store, None, stop=0).columns)
+    else:
+        return list(read_dat(filepath, nrows=0, **kwargs).columns)
+
+
+def get_columns(data:pd.DataFrame, ids:list):
+    """ Get columns of a DataFrame by positions (starting from 0; `None` for the index), as a list of 1D arrays.
+    The arrays are views of the data without copy; use `np.column_stack()` if a 2D array is needed.
+    """
+    return [data.index.to_numpy() if i is None else data.iloc[:, i].to_numpy() for i in ids]
+
+
+def _read_binary(filepath, fmt:str, usecols:Optional[list]=None, key=None):
+    """ Read binary formats with only the columns in `usecols`. The columns of npy files are memory mapped.
+    """
+    if fmt == 'npy':
+        arr = np.load(filepath, mmap_mode='r')
+        return pd.DataFrame(_array_columns(arr, usecols), copy=False)
+    elif fmt == 'npz':
+        with np.load(filepath) as f:
+            if _npz_single_array(f):
+                return pd.DataFrame(_array_columns(f[f.files[0]], usecols), copy=False)
+            return pd.DataFrame({k: f[k] for k in (usecols if usecols is not None else f.files)}, copy=False)
+    elif fmt == 'parquet':
+        return pd.read_parquet(filepath, columns=usecols)
+    elif fmt == 'feather':
+        import pyarrow.feather
+        return pyarrow.feather.read_table(filepath, columns=usecols, memory_map=True).to_pandas(split_blocks=True)
+    elif fmt == 'hdf5':
+        with pd.HDFStore(filepath, 'r') as store:
+            return _read_hdf(store, key, usecols)
+    else:
+        raise ValueError(fmt)
+
+
+def _get_hdf_key(store, key=None):
+    if key is None:
+        keys = store.keys()
+        if len(keys) != 1:
+            raise ValueError('key must be provided when HDF5 file contains multiple datasets.')
+        key = keys[0]
+    return key
+
+
+def _read_hdf(store, key=None, usecols:Optional[list]=None, start:Optional[int]=None, stop:Optional[int]=None):
+    """ Read rows [start, stop) of a dataset in a HDFStore. Columns can only be selected in table format stores; 
+    fixed format stores (the default of `DataFrame.to_hdf()`) are read entirely then selected.
+    """
+    key = _get_hdf_key(store, key)
+    if store.get_storer(key).is_table:
+        return store.select(key, columns=usecols, start=start, stop=stop)
+    data = store.select(key, start=start, stop=stop)
+    return data if usecols is None else data[usecols]
+
+
+def _sample_binary(filepath, fmt:str, max_bytes:int, max_time:Optional[float], block_size:int, 
+                   usecols:Optional[list]=None, key=None):
+    """ Read evenly spaced blocks of rows from a binary file (see `sample_dat()`). Returns the data and the fraction of rows read.
+    The number of rows read is bounded by the average size of rows.
+
+    The blocks of parquet/feather files are taken from the beginning of evenly spaced row groups/record batches.
+    Compressed npz files cannot be seeked, so only the head is read, and the fraction is `None`.
+    """
+    import time
+
+    start_time = time.perf_counter()
+    size = os.path.getsize(filepath)
+    blocks = {}
+
+    def _read_blocks(nblock, read):
+        for j in _spread_order(nblock):
+            if max_time is not None and blocks and time.perf_counter() - start_time > max_time:
+                break
+            blocks[j] = read(j)
+        return [blocks[j] for j in sorted(blocks)]
+
+    if fmt in ('parquet', 'feather'):
+        import pyarrow
+        if fmt == 'parquet':
+            import pyarrow.parquet
+            source = pyarrow.parquet.ParquetFile(filepath)
+            ngroup, nrows = source.num_row_groups, source.metadata.num_rows
+            read_group = lambda g, n: pyarrow.Table.from_batches([next(source.iter_batches(batch_size=n, row_groups=[g], columns=usecols))])
+        else:
+            source = pyarrow.ipc.open_file(pyarrow.memory_map(os.fspath(filepath)))
+            ngroup, nrows = source.num_record_batches, source.count_rows()
+            read_group = lambda g, n: pyarrow.Table.from_batches([source.get_batch(g).slice(0, n)]).select(usecols or source.schema.names)
+
+        nblock = max(min(max_bytes // block_size, ngroup), 1)
+        rows = max(max_bytes * nrows // size // nblock, 1)
+        groups = np.linspace(0, ngroup - 1, nblock).round().astype(np.int64)
+        table = pyarrow.concat_tables(_read_blocks(nblock, lambda j: read_group(groups[j], rows)))
+        return table.to_pandas(split_blocks=True), table.num_rows / max(nrows, 1)
+
+    store = None
+    if fmt == 'npy':
+        arr = np.load(filepath, mmap_mode='r')
+        nrows = len(arr)
+        read_rows = lambda a, b: pd.DataFrame(_array_columns(arr[a:b], usecols), index=pd.RangeIndex(a, b))
+    elif fmt == 'npz':
+        with np.load(filepath) as f:
+            single = _npz_single_array(f)
+            names = f.files[:1] if single else (usecols if usecols is not None else f.files)
+            arrays = {k: _npz_mmap(filepath, f, k) for k in names}
+            if any(a is None for a in arrays.values()):
+                headers = [_npz_header(f, k) for k in names]
+                row_bytes = sum(dtype.itemsize * int(np.prod(shape[1:])) for shape, dtype in headers)
+                head = {k: _npz_head(f, k, max(max_bytes // row_bytes, 1)) for k in names}
+                data = pd.DataFrame(_array_columns(head[names[0]], usecols) if single else head)
+                return data, None
+        nrows = len(arrays[names[0]])
+        if single:
+            read_rows = lambda a, b: pd.DataFrame(_array_columns(arrays[names[0]][a:b], usecols), index=pd.RangeIndex(a, b))
+        else:
+            read_rows = lambda a, b: pd.DataFrame({k: v[a:b] for k, v in arrays.items()}, index=pd.RangeIndex(a, b))
+    elif fmt == 'hdf5':
+        store = pd.HDFStore(filepath, 'r')
+        key = _get_hdf_key(store, key)
+        storer = store.get_storer(key)
+        nrows = storer.nrows if storer.is_table else storer.shape[0]
+        read_rows = lambda a, b: _read_hdf(store, key, usecols, a, b)
+    else:
+        raise ValueError(fmt)
+
+    rows = max(block_size * nrows // size, 1)
+    nblock = max(max_bytes // block_size, 1)
+    offsets = np.linspace(0, max(nrows - rows, 0), nblock).astype(np.int64)
+    try:
+        data = pd.concat(_read_blocks(nblock, lambda j: read_rows(offsets[j], offsets[j] + rows)))
+    finally:
+        if store is not None:
+            store.close()
+    return data, min(len(blocks) * rows / max(nrows, 1), 1.0)
+
+
+def _open_decompressed(filepath, method:str):
+    if method == 'gzip':
+        import gzip
+        return gzip.open(filepath, 'rb')
+    elif method == 'xz':
+        import lzma
+        return lzma.open(filepath, 'rb')
+    elif method == 'bz2':
+        import bz2
+        return bz2.open(filepath, 'rb')
+    elif method == 'zstd':
+        try:
+            from compression import zstd
+            return zstd.open(filepath, 'rb')
+        except ImportError:
+            pass
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError('Reading zstd files requires Python >= 3.14 or the "zstandard" package') from None
+        return zstandard.ZstdDecompressor().stream_reader(open(filepath, 'rb'), closefd=True)
+    else:
+        raise ValueError(method)
+
+
+class _ThreadedReader(io.RawIOBase):
+    """ Reads a stream in a background thread, so decompression runs concurrently with parsing.
+    """
+
+    def __init__(self, source, chunk_size:int=1<<20, max_chunks:int=8):
+        self._source = source
+        self._chunk_size = chunk_size
+        self._queue = queue.Queue(max_chunks)
+        self._stop = threading.Event()
+        self._buf = memoryview(b'')
+        self._eof = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                chunk = self._source.read(self._chunk_size)
+                self._put(chunk)
+                if not chunk:
+                    break
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buf and not self._eof:
+            item = self._queue.get()
+            if isinstance(item, Exception):
+                raise item
+            elif not item:
+                self._eof = True
+            else:
+                self._buf = memoryview(item)
+
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            self._source.close()
+        super().close()
+
+
+def open_dat(filepath):
+    """ Open a file in binary mode. Compressed files (gzip/xz/zstd/bz2, detected by magic bytes) are decompressed
+    in a background thread while being read.
+    """
+    method = detect_compression(filepath)
+    if method is None:
+        return open(filepath, 'rb')
+    else:
+        return io.BufferedReader(_ThreadedReader(_open_decompressed(filepath, method)))
+
+
+def _is_local_file(filepath_or_buffer):
+    """ Whether the argument is a path to a local file, whose magic bytes can be detected. 
+    Others (buffers, URLs, fsspec paths) are passed to pandas as is.
+    """
+    return isinstance(filepath_or_buffer, (str, os.PathLike)) and os.path.isfile(filepath_or_buffer)
+
+
+def read_dat(filepath_or_buffer, xrange:Optional[tuple]=None, xcol:Union[int,str]=1, index:bool=True, **kwargs):
     """ A simple wrapper of `pandas.read_csv()` except `sep` defaults to white spaces (\\s+) and
     `index_col` defaults to False.
+
+    Compressed files are detected by their magic bytes regardless of the extension, and are decompressed
+    on the fly without temporary files (see `open_dat()`), unless `compression` is given.
+
+    Binary files (npy/npz/hdf5/parquet/feather, see `detect_format()`) are also supported. Only the columns in `usecols` are read,
+        and npy files are memory mapped. The columns of plain arrays are named "col1", "col2", ... (see `read_columns()`).
+        Only `usecols`, `nrows`, `chunksize` and `key` (for hdf5) apply to them.
+
+    xrange: (start, end). Only read the rows with x inside the range, plus one row on each side. Either end may be `None`.
+    xcol: The x column, either a number (starting from 1) or a column title. Must be monotonic if `xrange` is given.
+    index: Whether to use the index of x column (see `build_index()`) to read only the rows in `xrange` from disk. 
+        The index is built and saved in the first use. Only applies to uncompressed files.
     """
     
+    if _is_local_file(filepath_or_buffer):
+        fmt = detect_format(filepath_or_buffer)
+        if fmt is not None:
+            data = _read_binary(filepath_or_buffer, fmt, kwargs.get('usecols'), kwargs.get('key'))
+            if xrange is not None:
+                data = _clip_rows(data, xrange, xcol)
+            if kwargs.get('nrows') is not None:
+                data = data.iloc[:kwargs['nrows']]
+            if kwargs.get('chunksize'):
+                return (data.iloc[j:j+kwargs['chunksize']] for j in range(0, len(data), kwargs['chunksize']))
+            return data
+
     kwargs1 = kwargs.copy()
     kwargs1.setdefault('index_col', False)
     kwargs1.setdefault('sep', '\\s+')
 
+    if xrange is not None:
+        if index and _is_local_file(filepath_or_buffer) and not \
+            set(kwargs1) & {'compression', 'header', 'skiprows', 'nrows', 'chunksize', 'iterator', 'comment', 'names'} and \
+            detect_compression(filepath_or_buffer) is None:
+            return _read_indexed(filepath_or_buffer, xrange, xcol, **kwargs1)
+        else:
+            data = read_dat(filepath_or_buffer, **kwargs1)
+            return _clip_rows(data, xrange, xcol)
+
+    if _is_local_file(filepath_or_buffer) and 'compression' not in kwargs1 and \
+        detect_compression(filepath_or_buffer) is not None:
+        f = open_dat(filepath_or_buffer)
+        if kwargs1.get('chunksize') or kwargs1.get('iterator'):
+            return pd.read_csv(f, **kwargs1)    # the stream is closed when the reader is released
+        with f:
+            return pd.read_csv(f, **kwargs1)
+
     return pd.read_csv(filepath_or_buffer, **kwargs1)
 
 
 read_csv = pd.read_csv
 
 
+def _spread_order(n:int):
+    """ An order of range(n) such that every prefix is spread evenly (bit-reversal).
+    """
+    nbit = max(n - 1, 1).bit_length()
+    keys = [int(format(j, '0%db' % nbit)[::-1], 2) for j in range(n)]
+    return sorted(range(n), key=keys.__getitem__)
+
+
+def sample_dat(filepath, max_bytes:int=16<<20, max_time:Optional[float]=None, block_size:int=1<<16, **kwargs):
+    """ Read a sample of rows, spread evenly across the file, with bounded cost. Used for a quick preview of large files.
+
+    Reads blocks of `block_size` bytes (smaller for a small `max_bytes`, so there are at least 16 blocks) at evenly spaced offsets,
+    and keeps the complete lines in each block.
+    Compressed files cannot be seeked, so only the head of the file is read. Binary files are sampled by blocks of rows
+    (see `_sample_binary()`).
+
+    max_bytes: The maximum number of bytes read.
+    max_time: The maximum time (seconds) spent in reading. The blocks are read in an order such that the sample
+        is always spread across the file.
+
+    Additional kwargs will be passed to `read_dat()`. The fraction of file read is stored in `data.attrs['preview']`.
+    """
+    import time
+
+    start_time = time.perf_counter()
+    size = os.path.getsize(filepath)
+    if size <= max_bytes:
+        data = read_dat(filepath, **kwargs)
+        data.attrs['preview'] = 1.0
+        return data
+
+    # at least a few blocks, so the sample is spread even for a small max_bytes
+    nblock = max(max_bytes // block_size, 16)
+    block_size = max(max_bytes // nblock, 1)
+
+    fmt = detect_format(filepath)
+    if fmt is not None:
+        data, fraction = _sample_binary(filepath, fmt, max_bytes, max_time, block_size, kwargs.get('usecols'), kwargs.get('key'))
+        data.attrs['preview'] = fraction
+        return data
+
+    if detect_compression(filepath) is not None:
+        with open_dat(filepath) as f:
+            body = f.read(max_bytes)
+        body = body[:body.rfind(b'\n')+1]
+        header = b''
+        fraction = None     # unknown
+    else:
+        with open(filepath, 'rb') as f:
+            header = b''
+            while not header.strip():
+                header = f.readline()
+            data_start = f.tell()
+
+            offsets = np.linspace(data_start, size - block_size, nblock).astype(np.int64)
+            blocks = {}
+            for j in _spread_order(nblock):
+                if max_time is not None and blocks and time.perf_counter() - start_time > max_time:
+                    break
+                f.seek(offsets[j])
+                block = f.read(block_size)
+                if offsets[j] != data_start:   # resync to the next line
+                    block = block[block.find(b'\n')+1:]
+                blocks[j] = block[:block.rfind(b'\n')+1]
+
+        body = b''.join(blocks[j] for j in sorted(blocks))
+        fraction = len(blocks) * block_size / (size - data_start)
+
+    data = read_dat(io.BytesIO(header + body), **kwargs)
+    data.attrs['preview'] = fraction
+    return data
+
+
+def get_index_path(filepath):
+    return os.fspath(filepath) + '.lineidx.npz'
+
+
+def _split_line(line:bytes, sep:str):
+    text = line.decode().strip()
+    return re.split(sep, text) if len(sep) > 1 else text.split(sep)
+
+
+def _get_col_id(header:list, xcol:Union[int,str]):
+    try:
+        return int(xcol) - 1
+    except ValueError:
+        return header.index(xcol)
+
+
+def build_index(filepath, xcol:Union[int,str]=1, sep:str='\\s+', stride:int=1024, save:bool=True):
+    """ Build an index of a monotonic x column, which maps x to byte offsets of every `stride` rows.
+    The file must have a single header line. 
+
+    xcol: Number (starting from 1) or title of the x column.
+    save: Save the index next to the file (see `get_index_path()`). Will be reused by `read_dat(xrange=...)` until the file changes.
+
+    Returns a dict of arrays.
+    """
+    st = os.stat(filepath)
+    with open(filepath, 'rb') as f:
+        header = b''
+        while not header.strip():
+            header_start = f.tell()
+            header = f.readline()
+            if not header:
+                raise ValueError('Empty file')
+        col = _get_col_id(_split_line(header, sep), xcol)
+
+        # row k starts after the (k-1)th line break. Samples rows 0, stride, 2*stride, ...
+        offsets = [f.tell()]
+        base = f.tell()
+        nbreak = 0
+        while True:
+            block = f.read(1 << 24)
+            if not block:
+                break
+            breaks = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == ord('\n'))
+            sel = breaks[(stride - 1 - nbreak) % stride::stride]
+            offsets.extend((base + sel + 1).tolist())
+            nbreak += len(breaks)
+            base += len(block)
+        if offsets[-1] >= st.st_size:
+            offsets.pop()
+
+        samples = []
+        for o in offsets:
+            f.seek(o)
+            samples.append(_split_line(f.readline(), sep))
+
+    offsets = [o for o, s_ in zip(offsets, samples) if len(s_) > col and s_[col]]
+    xs = np.array([float(s_[col]) for s_ in samples if len(s_) > col and s_[col]])
+    sign = -1 if len(xs) > 1 and xs[-1] < xs[0] else 1
+    if np.any(np.diff(xs * sign) < 0):
+        raise ValueError('x column is not monotonic')
+
+    idx = dict(x=xs, offset=np.array(offsets, dtype=np.int64), header=np.array([header_start, header_start + len(header)]), sign=np.int64(sign),
+               size=np.int64(st.st_size), mtime=np.int64(st.st_mtime_ns), xcol=str(xcol), sep=sep, stride=np.int64(stride))
+    if save:
+        try:
+            np.savez(get_index_path(filepath), **idx)
+        except OSError:
+            pass
+    return idx
+
+
+def load_index(filepath, xcol:Union[int,str]=1, sep:str='\\s+'):
+    """ Load the index built by `build_index()`. Returns `None` if there is no index or it is outdated.
+    """
+    try:
+        with np.load(get_index_path(filepath)) as f:
+            idx = {k: f[k] for k in f.files}
+    except (OSError, ValueError):
+        return None
+
+    st = os.stat(filepath)
+    if idx['size'] != st.st_size or idx['mtime'] != st.st_mtime_ns or str(idx['xcol']) != str(xcol) or str(idx['sep']) != sep:
+        return None
+    return idx
+
+
+def _clip_rows(data:pd.DataFrame, xrange:tuple, xcol:Union[int,str]):
+    """ Select rows with monotonic x inside the range, and one more row on each side.
+    """
+    x = data.iloc[:, _get_col_id(list(data.columns), xcol)].to_numpy()
+    lo, hi = xrange
+    if len(x) > 1 and x[-1] < x[0]:
+        x, lo, hi = -x, (None if hi is None else -hi), (None if lo is None else -lo)
+
+    a = 0 if lo is None else np.searchsorted(x, lo, 'left')
+    b = len(x) if hi is None else np.searchsorted(x, hi, 'right')
+    return data.iloc[max(a-1, 0):min(b+1, len(x))]
+
+
+def _read_indexed(filepath, xrange:tuple, xcol:Union[int,str], **kwargs):
+    sep = kwargs['sep']
+    idx = load_index(filepath, xcol, sep)
+    if idx is None:
+        idx = build_index(filepath, xcol, sep)
+
+    sx = idx['x'] * idx['sign']
+    lo, hi = xrange
+    if idx['sign'] < 0:
+        lo, hi = hi, lo
+    lo = -np.inf if lo is None else lo * idx['sign']
+    hi = np.inf if hi is None else hi * idx['sign']
+
+    # Starts from the last sample < lo, ends at the first sample > hi, to include the margin rows.
+    i0 = max(np.searchsorted(sx, lo, 'left') - 1, 0)
+    i1 = np.searchsorted(sx, hi, 'right')
+
+    with open(filepath, 'rb') as f:
+        f.seek(idx['header'][0])
+        header = f.read(idx['header'][1] - idx['header'][0])
+        if not len(idx['offset']):
+            body = b''
+        else:
+            f.seek(idx['offset'][i0])
+            if i1 < len(sx):
+                body = f.read(idx['offset'][i1] - idx['offset'][i0]) + f.readline()
+            else:
+                body = f.read()
+
+    data = pd.read_csv(io.BytesIO(header + body), **kwargs)
+    return _clip_rows(data, xrange, xcol).reset_index(drop=True)
+
+
 def write_dat(data, path_or_buf, columns=None, sep='\t', transpose=False, **kwargs):
     """ A simple wrapper of `pandas.DataFrame.to_csv()`. Used for either a DataFrame, or numpy array + column titles.
 
@@ -0,0 +1,326 @@
+from typing import Optional, Union
+import os.path
+import pickle
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib import image
+
+from .rc import rc_scope, get_rc, get_figure_rc
+
+
+raster_formats = ('png', 'jpg', 'jpeg', 'tif', 'tiff', 'webp')
+
+
+def get_format(filename:str, format:Optional[str]=None):
+    """ Get the output format from the filename extension; Defaults to rcParams['savefig.format'].
+    """
+    if format:
+        return format.lower()
+    ext = os.path.splitext(filename)[1]
+    return ext[1:].lower() if ext else matplotlib.rcParams['savefig.format']
+
+
+def _get_dpi(figure:Figure, dpi):
+    if dpi is None:
+        dpi = matplotlib.rcParams['savefig.dpi']
+    if dpi == 'figure':
+        dpi = figure.dpi
+    return dpi
+
+
+def render_rgba(figure:Figure, dpi=None, transparent:bool=False, **kwargs):
+    """ Render the figure with Agg into an (height, width, 4) uint8 array, with the same settings as `savefig()`,
+    except that the whole figure is always rendered (i.e., `savefig.bbox` is ignored).
+    Additional kwargs will be passed to `savefig()`.
+    """
+    import io
+
+    dpi = _get_dpi(figure, dpi)
+    buf = io.BytesIO()
+    figure.savefig(buf, format='rgba', dpi=dpi, transparent=transparent, bbox_inches=None, **kwargs)
+    w, h = figure.get_size_inches() * dpi
+    return np.frombuffer(buf.getbuffer(), dtype=np.uint8).reshape(int(h), int(w), 4)
+
+
+def write_rgba(rgba:np.ndarray, filename:str, format:Optional[str]=None, dpi=None):
+    """ Encode a rendered image into a raster file. Does not touch the figure, so is safe to be called in other threads.
+    """
+    image.imsave(filename, rgba, format=get_format(filename, format), origin='upper', dpi=dpi or matplotlib.rcParams['figure.dpi'])
+
+
+def _pickle_figure(figure:Figure):
+    """ Pickle a figure, without registering the copy to pyplot when loaded.
+    """
+    manager = figure.canvas.manager
+    figure.canvas.manager = None
+    try:
+        return pickle.dumps(figure)
+    finally:
+        figure.canvas.manager = manager
+
+
+# parallel rasterization
+
+_tile_pool = None
+
+
+def _get_tile_pool(processes:int):
+    global _tile_pool
+    if _tile_pool is None or _tile_pool._max_workers != processes:
+        from concurrent.futures import ProcessPoolExecutor
+        if _tile_pool is not None:
+            _tile_pool.shutdown()
+        _tile_pool = ProcessPoolExecutor(processes, initializer=matplotlib.use, initargs=('agg',))
+    return _tile_pool
+
+
+def _figure_artists(figure:Figure):
+    return figure.texts + figure.legends + figure.lines + figure.patches + figure.images + figure.artists
+
+
+def _render_tile(pickled:bytes, rc:dict, indices:list, dpi, transparent:bool):
+    """ Render a subset of axes on a transparent canvas. Returns the cropped image and its offset.
+    """
+    figure = pickle.loads(pickled)
+    for j, a in enumerate(figure.axes):
+        a.set_visible(j in indices)
+    for a in _figure_artists(figure):
+        a.set_visible(False)
+
+    with matplotlib.rc_context(rc):
+        rgba = render_rgba(figure, dpi, transparent, facecolor='none', edgecolor='none')
+    
+    rows, = np.nonzero(rgba[:, :, 3].any(axis=1))
+    cols, = np.nonzero(rgba[:, :, 3].any(axis=0))
+    if not len(rows):
+        return None, (0, 0)
+    return rgba[rows[0]:rows[-1]+1, cols[0]:cols[-1]+1].copy(), (rows[0], cols[0])
+
+
+def _composite(dst:np.ndarray, src:np.ndarray, offset:tuple):
+    """ Alpha composite `src` over `dst` (float, in [0, 1]) at offset, in place.
+    """
+    y, x = offset
+    d = dst[y:y+src.shape[0], x:x+src.shape[1]]
+    s = src.astype(np.float32) / 255
+    sa, da = s[:, :, 3:], d[:, :, 3:]
+    oa = sa + da * (1 - sa)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d[:, :, :3] = np.where(oa > 0, (s[:, :, :3] * sa + d[:, :, :3] * da * (1 - sa)) / oa, 0)
+    d[:, :, 3:] = oa
+
+
+def render_rgba_parallel(figure:Figure, dpi=None, transparent:bool=False, processes:Optional[int]=None):
+    """ Render the figure into an RGBA array like `render_rgba()`, where the subplots are rasterized in parallel 
+    worker processes, and then composited. The layout of the figure must be already solved and fixed (as in `save_figure()`).
+
+    processes: Number of worker processes. Defaults to the number of CPUs.
+
+    The result is identical to `render_rgba()` up to rounding in the anti-aliased pixels.
+    """
+    dpi = _get_dpi(figure, dpi)
+    processes = processes or os.cpu_count()
+    axes = figure.axes
+    ngroup = min(processes, len(axes))
+    if ngroup < 2 or figure.subfigs:
+        return render_rgba(figure, dpi, transparent)
+
+    rc = {k: v for k, v in matplotlib.rcParams.items() if k != 'backend'}
+    pickled = _pickle_figure(figure)
+    groups = np.array_split(np.arange(len(axes)), ngroup)
+    jobs = [_get_tile_pool(processes).submit(_render_tile, pickled, rc, g.tolist(), dpi, transparent) for g in groups]
+
+    # the background and figure-level artists below the subplots; then those above.
+    visible = [a.get_visible() for a in axes]
+    artists = [a for a in _figure_artists(figure) if a.get_visible()]
+    try:
+        for a in axes:
+            a.set_visible(False)
+        for a in artists:
+            a.set_visible(a.zorder <= min(ax.zorder for ax in axes))
+        base = render_rgba(figure, dpi, transparent).astype(np.float32) / 255
+        
+        overlay = [a for a in artists if a.zorder > min(ax.zorder for ax in axes)]
+        if overlay:
+            figure.patch.set_visible(False)
+            for a in artists:
+                a.set_visible(a in overlay)
+            top = render_rgba(figure, dpi, transparent, facecolor='none', edgecolor='none')
+    finally:
+        figure.patch.set_visible(True)
+        for a, v in zip(axes, visible):
+            a.set_visible(v)
+        for a in artists:
+            a.set_visible(True)
+
+    for j in jobs:
+        tile, offset = j.result()
+        if tile is not None:
+            _composite(base, tile, offset)
+    if overlay:
+        _composite(base, top, (0, 0))
+
+    return np.round(base * 255).astype(np.uint8)
+
+
+def _split_outputs(figure:Figure, filenames:list, kwargs:dict):
+    """ Split the outputs into raster ones, which can share a `render_rgba()`, and others, which are saved by `savefig()`.
+    """
+    raster = [f for f in filenames if get_format(f) in raster_formats]
+    vector = [f for f in filenames if f not in raster]
+    if kwargs or get_rc(get_figure_rc(figure), 'savefig.bbox') == 'tight':
+        return [], filenames
+    return raster, vector
+
+
+@contextmanager
+def _frozen_layout(figure:Figure):
+    """ Solve the layout once, and disable the layout engine inside the context.
+    """
+    engine = figure.get_layout_engine()
+    if engine is None:
+        yield
+        return
+
+    figure.draw_without_rendering()
+    figure.set_layout_engine('none')
+    try:
+        yield
+    finally:
+        figure.set_layout_engine(engine)
+
+
+def save_figure(figure:Figure, filenames:Union[str,list], dpi=None, transparent:bool=False, concurrent:bool=False, 
+                processes:Optional[int]=None, **kwargs):
+    """ Save a figure to one or multiple files, possibly with different formats.
+
+    The layout is solved only once. All raster outputs (png/jpg/tiff/webp) share a single Agg rendering,
+    and vector outputs (pdf/svg/eps/...) are drawn once per file.
+
+    filenames: A filename or a list of filenames. The format is determined from the extension.
+    concurrent: Whether to encode and write the raster outputs in worker threads, while the vector outputs are drawn.
+    processes: If given, the raster outputs are rendered by tiles of subplots in that number of processes (see `render_rgba_parallel()`).
+
+    Additional kwargs will be passed to `savefig()` of vector outputs. If given, or `savefig.bbox` is 'tight', 
+    all outputs will be saved with `savefig()`.
+    """
+    if isinstance(filenames, str):
+        filenames = [filenames]
+
+    raster, vector = _split_outputs(figure, filenames, kwargs)
+    if len(raster) == 1 and not processes:     # nothing to share
+        raster, vector = [], filenames
+
+    dpi = _get_dpi(figure, dpi)
+
+    # Drawing is done under the rc settings of the figure (which holds the global rc lock);
+    # the encoding of raster images does not touch the figure, so is done outside.
+    with rc_scope(figure), _frozen_layout(figure):
+        if raster:
+            rgba = render_rgba_parallel(figure, dpi, transparent, processes) if processes else render_rgba(figure, dpi, transparent)
+
+        if concurrent and raster:
+            pool = ThreadPoolExecutor(len(raster))
+            jobs = [pool.submit(write_rgba, rgba, f, dpi=dpi) for f in raster]
+        
+        for f in vector:
+            figure.savefig(f, dpi=dpi, transparent=transparent, **kwargs)
+
+    if concurrent and raster:
+        with pool:
+            for j in jobs:
+                j.result()
+    else:
+        for f in raster:
+            write_rgba(rgba, f, dpi=dpi)
+
+
+# background saving
+
+_save_pool = None
+_save_slots = None
+_save_lock = threading.Lock()
+_pending = set()
+
+
+def set_background_saving(workers:int=2, max_pending:int=4):
+    """ Set the number of worker threads of background saving, and the maximum number of saves in flight.
+    `save_figure_async()` blocks when `max_pending` saves are not finished yet.
+    """
+    wait_saves()
+    with _save_lock:
+        pool = _save_pool
+        _init_background_saving(workers, max_pending)
+    if pool is not None:    # outside the lock, as the done callbacks of its jobs need it
+        pool.shutdown()
+
+
+def _init_background_saving(workers:int=2, max_pending:int=4):
+    # must be called with _save_lock held
+    global _save_pool, _save_slots
+    _save_pool = ThreadPoolExecutor(workers, thread_name_prefix='lineutil-save')
+    _save_slots = threading.BoundedSemaphore(max_pending)
+
+
+def _save_snapshot(raster:list, rgba, vector:list, pickled, dpi, transparent:bool, kwargs:dict):
+    for f in raster:
+        write_rgba(rgba, f, dpi=dpi)
+    if vector:
+        figure = pickle.loads(pickled)
+        with rc_scope(figure):
+            for f in vector:
+                figure.savefig(f, dpi=dpi, transparent=transparent, **kwargs)
+
+
+def save_figure_async(figure:Figure, filenames:Union[str,list], dpi=None, transparent:bool=False, **kwargs):
+    """ Save a figure in the background. Returns a `concurrent.futures.Future`, which can be waited by `result()`.
+
+    The figure is rendered (raster outputs) or copied (vector outputs) in the calling thread, so it can be modified or
+    closed right after return; the encoding and writing are done in a worker thread. See `set_background_saving()`.
+    """
+    if isinstance(filenames, str):
+        filenames = [filenames]
+
+    raster, vector = _split_outputs(figure, filenames, kwargs)
+
+    # a job releases the slot it acquired, even if set_background_saving() has replaced the pool since
+    with _save_lock:
+        if _save_pool is None:
+            _init_background_saving()
+        slots = _save_slots
+    slots.acquire()
+
+    try:
+        dpi = _get_dpi(figure, dpi)
+        with rc_scope(figure), _frozen_layout(figure):
+            rgba = render_rgba(figure, dpi, transparent) if raster else None
+            pickled = _pickle_figure(figure) if vector else None
+
+        with _save_lock:    # the current pool is not shut down before the job is submitted
+            job = _save_pool.submit(_save_snapshot, raster, rgba, vector, pickled, dpi, transparent, kwargs)
+            _pending.add(job)
+    except BaseException:
+        slots.release()
+        raise
+
+    def _done(j):
+        with _save_lock:
+            _pending.discard(j)
+        slots.release()
+
+    job.add_done_callback(_done)
+    return job
+
+
+def wait_saves():
+    """ Wait until all background saves are finished. Raises the first error if any of them failed.
+    """
+    with _save_lock:
+        jobs = list(_pending)
+    for j in jobs:
+        j.result()
@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+
+import matplotlib
+from matplotlib import font_manager
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _cache_path():
+    return os.path.join(matplotlib.get_cachedir(), 'lineutil-fonts.json')
+
+
+def _cache_key():
+    """ The cached paths are only valid for the same matplotlib and the same set of installed fonts.
+    """
+    return '%s-%d' % (matplotlib.__version__, len(font_manager.fontManager.ttflist))
+
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        try:
+            with open(_cache_path()) as f:
+                c = json.load(f)
+        except (OSError, ValueError):
+            c = {}
+        if c.get('key') != _cache_key():
+            c = {'key': _cache_key(), 'fonts': {}}
+        _cache = c
+    return _cache
+
+
+def _save_cache():
+    try:
+        with open(_cache_path(), 'w') as f:
+            json.dump(_cache, f)
+    except OSError:
+        pass
+
+
+def _find_font_path(family:str):
+    name = family.lower()
+    for f in font_manager.fontManager.ttflist:
+        if f.name.lower() == name:
+            return font_manager.findfont(font_manager.FontProperties(family=f.name), fallback_to_default=False)
+    return None
+
+
+def _resolve(family:str, fonts:dict):
+    if family not in fonts or (fonts[family] is not None and not os.path.isfile(fonts[family])):
+        fonts[family] = _find_font_path(family)
+        return True
+    return False
+
+
+def resolve_font(family:str):
+    """ Return the path of a font family, or `None` if it is not installed. The result is persisted
+    in the matplotlib cache directory, so the font manager is only searched once per family.
+    """
+    with _cache_lock:
+        fonts = _load_cache()['fonts']
+        if _resolve(family, fonts):
+            _save_cache()
+        return fonts[family]
+
+
+def resolve_fonts(families:list):
+    """ Filter a list of font families to the ones installed.
+    Generic families (e.g. 'serif', 'sans-serif') are always kept.
+    """
+    with _cache_lock:
+        fonts = _load_cache()['fonts']
+        updated = False
+        for f in families:
+            if f not in font_manager.font_family_aliases:
+                updated = _resolve(f, fonts) or updated
+        if updated:
+            _save_cache()
+
+        return [f for f in families if f in font_manager.font_family_aliases or fonts[f] is not None]
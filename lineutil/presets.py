@@ -1,24 +1,28 @@
 
 from . import style
 
-def preset_prl():
-    style.setd_serif(fontsize=16)
-    style.setd_math_font()
-    style.setd_subplot()
-    style.setd_legend()
-    style.setd_grid(color='#bbb')
-    style.setd_line()
-    style.setd_ticks(length=7, width=0.8)
-    style.setd_minor_ticks(length=3, width=0.8)
+def preset_prl(rc=None):
+    """ Serif fonts and ticks inside. If `rc` is given, the settings are written into it instead of the global rcParams.
+    """
+    style.setd_serif(fontsize=16, rc=rc)
+    style.setd_math_font(rc=rc)
+    style.setd_subplot(rc=rc)
+    style.setd_legend(rc=rc)
+    style.setd_grid(color='#bbb', rc=rc)
+    style.setd_line(rc=rc)
+    style.setd_ticks(length=7, width=0.8, rc=rc)
+    style.setd_minor_ticks(length=3, width=0.8, rc=rc)
 
 
-def preset_nature():
-    style.setd_sans_serif(fontsize=14)
-    style.setd_regular_math_font()
-    style.setd_subplot()
-    style.setd_legend()
-    style.setd_grid(color='#bbb')
-    style.setd_line()
-    style.setd_ticks(length=4, width=0.8, direction='out', double_ticks=None)
+def preset_nature(rc=None):
+    """ Sans-serif fonts and ticks outside. If `rc` is given, the settings are written into it instead of the global rcParams.
+    """
+    style.setd_sans_serif(fontsize=14, rc=rc)
+    style.setd_regular_math_font(rc=rc)
+    style.setd_subplot(rc=rc)
+    style.setd_legend(rc=rc)
+    style.setd_grid(color='#bbb', rc=rc)
+    style.setd_line(rc=rc)
+    style.setd_ticks(length=4, width=0.8, direction='out', double_ticks=None, rc=rc)
     
     
\ No newline at end of file
@@ -0,0 +1,47 @@
+from typing import Optional, Union
+import threading
+from contextlib import contextmanager
+
+import matplotlib
+from matplotlib.figure import Figure, FigureBase
+from matplotlib.axes import Axes
+
+
+rc_lock = threading.RLock()
+
+
+def get_figure_rc(obj:Union[Figure,Axes,dict,None]):
+    """ Get the rc settings attached to a figure (see `new_figure()`). Returns `None` if there is not.
+    """
+    if isinstance(obj, Axes):
+        obj = obj.figure
+    if isinstance(obj, FigureBase):
+        return getattr(obj.figure, '_lineutil_rc', None)    # the root figure
+    return obj
+
+
+@contextmanager
+def rc_scope(obj:Union[Figure,Axes,dict,None]=None):
+    """ Apply the rc settings of a figure (or a dict) within the context.
+
+    Matplotlib reads the global rcParams when artists are created and drawn, so this context holds a global lock.
+    Figures with different settings can be built in multiple threads, as long as artists are created inside this context.
+    """
+    with rc_lock, matplotlib.rc_context(get_figure_rc(obj)):
+        yield
+
+
+def set_rc(rc:Optional[dict], group:str, **kwargs):
+    """ Set `group.key=value` into either the global rcParams (if rc is None) or the dict `rc`.
+    """
+    if rc is None:
+        with rc_lock:
+            matplotlib.rc(group, **kwargs)
+    else:
+        rc.update({group + '.' + k: v for k, v in kwargs.items()})
+
+
+def get_rc(rc:Optional[dict], key:str):
+    """ Get rc value from the dict `rc`, or the global rcParams if it's not there.
+    """
+    return rc[key] if rc is not None and key in rc else matplotlib.rcParams[key]
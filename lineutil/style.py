@@ -1,67 +1,77 @@
 
 from typing import Optional, Union
-import colorsys
+from functools import lru_cache, partial
 
+import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.figure import Figure
 from matplotlib.axes import Axes
 from matplotlib import ticker, colors
 
+from .fonts import resolve_fonts
+from .export import save_figure, save_figure_async
+from .rc import rc_scope, set_rc, get_rc
+
 # rc-related
+# All setd_xx() functions set the global rcParams by default. If a dict `rc` is given, the settings are written into it instead,
+# which can be used for a single figure by `new_figure(rc=rc)`.
 
-def setd_font(fontsize:int=14, fontfamily:str='sans-serif'):
-    plt.rcParams['font.size'] = fontsize
-    plt.rcParams['font.family'] = fontfamily
+def setd_font(fontsize:int=14, fontfamily:str='sans-serif', rc:Optional[dict]=None):
+    set_rc(rc, 'font', size=fontsize, family=fontfamily)
 
 
-def setd_sans_serif(fontsize:int=14):
+def setd_sans_serif(fontsize:int=14, rc:Optional[dict]=None):
     """ Set default font to be sans-serif. Helvetica and Arial will be prefered.
+    Only the installed fonts are added, so matplotlib does not search for missing ones on every text.
     """
-    plt.rcParams['font.size'] = fontsize
-    plt.rcParams['font.family'] = 'sans-serif'
-    plt.rcParams['font.sans-serif'] = ['Helvetica', 'Arial'] + plt.rcParams['font.sans-serif']
+    set_rc(rc, 'font', size=fontsize, family='sans-serif', 
+           **{'sans-serif': resolve_fonts(_unique(['Helvetica', 'Arial'] + get_rc(rc, 'font.sans-serif')))})
 
 
-def setd_serif(fontsize:int=14):
+def setd_serif(fontsize:int=14, rc:Optional[dict]=None):
     """ Set default font to be serif. Times New Roman and Times will be prefered.
+    Only the installed fonts are added, so matplotlib does not search for missing ones on every text.
     """
-    plt.rcParams['font.size'] = fontsize
-    plt.rcParams['font.family'] = 'serif'
-    plt.rcParams['font.serif'] = ['Times New Roman', 'Times'] + plt.rcParams['font.serif']
+    set_rc(rc, 'font', size=fontsize, family='serif', 
+           serif=resolve_fonts(_unique(['Times New Roman', 'Times'] + get_rc(rc, 'font.serif'))))
+
 
+def _unique(l):
+    return list(dict.fromkeys(l))
 
-def setd_math_font(fontfamily:str='cm', fontstyle:str='it'):
+
+def setd_math_font(fontfamily:str='cm', fontstyle:str='it', rc:Optional[dict]=None):
     """ Set the mathematical font family.
     """
-    plt.rc('mathtext', fontset=fontfamily, default=fontstyle)
+    set_rc(rc, 'mathtext', fontset=fontfamily, default=fontstyle)
 
-def setd_regular_math_font():
-    plt.rc('mathtext', default='regular')
+def setd_regular_math_font(rc:Optional[dict]=None):
+    set_rc(rc, 'mathtext', default='regular')
 
-def setd_subplot(linewidth:float=1, margin=0, autolimit_mode='round_numbers'):
+def setd_subplot(linewidth:float=1, margin=0, autolimit_mode='round_numbers', rc:Optional[dict]=None):
     """ Set the default parameters for subplots.
     """
-    plt.rc('axes', linewidth=linewidth, xmargin=margin, ymargin=margin, autolimit_mode=autolimit_mode)
+    set_rc(rc, 'axes', linewidth=linewidth, xmargin=margin, ymargin=margin, autolimit_mode=autolimit_mode)
 
-def setd_legend(frameon:bool=False, fancybox:bool=False, framealpha:float=0, edgecolor='black'):
+def setd_legend(frameon:bool=False, fancybox:bool=False, framealpha:float=0, edgecolor='black', rc:Optional[dict]=None):
     """ Set the default parameters for legend.
     """
-    plt.rc('legend', frameon=frameon, framealpha=framealpha, fancybox=fancybox, edgecolor=edgecolor)
+    set_rc(rc, 'legend', frameon=frameon, framealpha=framealpha, fancybox=fancybox, edgecolor=edgecolor)
 
 
-def setd_line(linewidth:float=1.5, markersize:float=6, edgewidth:float=0.8):
+def setd_line(linewidth:float=1.5, markersize:float=6, edgewidth:float=0.8, rc:Optional[dict]=None):
     """ Set the default parameters for lines.
     """
-    plt.rc('lines', linewidth=linewidth, markersize=markersize, markeredgewidth=edgewidth)
+    set_rc(rc, 'lines', linewidth=linewidth, markersize=markersize, markeredgewidth=edgewidth)
 
 
-def setd_grid(linewidth:float=0.5, color='#ccc'):
+def setd_grid(linewidth:float=0.5, color='#ccc', rc:Optional[dict]=None):
     """ Set the default parameters for grids.
     """
-    plt.rc('grid', color=color, linewidth=linewidth)
+    set_rc(rc, 'grid', color=color, linewidth=linewidth)
 
 
-def setd_ticks(axis:str='both', direction:str='in', width:float=0.5, length:float=3, double_ticks:str='both'):
+def setd_ticks(axis:str='both', direction:str='in', width:float=0.5, length:float=3, double_ticks:str='both', rc:Optional[dict]=None):
     """ Set the default parameters for ticks.
     
     axis: 'x'/'y'/'both'. The axis applied to.
@@ -88,17 +98,17 @@ def setd_ticks(axis:str='both', direction:str='in', width:float=0.5, length:floa
         raise ValueError(double_ticks)
     
     for g in groups:
-        plt.rc(g, direction=direction)
-        plt.rc(g + '.major', width=width, size=length)
+        set_rc(rc, g, direction=direction)
+        set_rc(rc, g + '.major', width=width, size=length)
 
     for g in groups2:
         if g == 'xtick':
-            plt.rc(g, top=True)
+            set_rc(rc, g, top=True)
         elif g == 'ytick':
-            plt.rc(g, right=True)
+            set_rc(rc, g, right=True)
 
 
-def setd_minor_ticks(axis='both', direction='in', width=0.5, length=2, nticks=1):
+def setd_minor_ticks(axis='both', direction='in', width=0.5, length=2, nticks=1, rc:Optional[dict]=None):
     """ Set the default parameters for ticks.
     
     axis: 'x'/'y'/'both'. The axis applied to.
@@ -115,16 +125,49 @@ def setd_minor_ticks(axis='both', direction='in', width=0.5, length=2, nticks=1)
 
 
     for g in groups:
-        plt.rc(g, direction=direction)
-        try:
-            plt.rc(g + '.minor', width=width, size=length, visible=True, ndivs=nticks+1)
-        except KeyError:
-            plt.rc(g + '.minor', width=width, size=length, visible=True)
+        set_rc(rc, g, direction=direction)
+        if g + '.minor.ndivs' in matplotlib.rcParams:
+            set_rc(rc, g + '.minor', width=width, size=length, visible=True, ndivs=nticks+1)
+        else:
+            set_rc(rc, g + '.minor', width=width, size=length, visible=True)
 
-def setd_constraint_layout():
+def setd_constraint_layout(rc:Optional[dict]=None):
     """ Set the constraint layout. Will be beneficial for most of the regular uses.
     """
-    plt.rc('figure.constrained_layout', use=True)
+    set_rc(rc, 'figure.constrained_layout', use=True)
+
+
+# figure creation
+
+def new_figure(rc:Optional[dict]=None, **kwargs):
+    """ Create a figure without pyplot, so it is not tracked by the pyplot state and can be used in any thread.
+
+    rc: The rc settings of this figure (see setd_xx()). They apply to the artists created by `lineutil` functions, 
+        and those created inside `rc_scope(figure)`.
+
+    Additional kwargs will be passed to `Figure()`.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    with rc_scope(rc):
+        figure = Figure(**kwargs)
+    FigureCanvasAgg(figure)
+    figure._lineutil_rc = dict(rc) if rc else None
+    return figure
+
+
+def subplots(nrows:int=1, ncols:int=1, rc:Optional[dict]=None, figure_kw:Optional[dict]=None, **kwargs):
+    """ A pyplot-free `plt.subplots()`. Returns the figure and the axes.
+
+    rc: The rc settings of the figure. See `new_figure()`.
+    figure_kw: Passed to `Figure()`.
+
+    Additional kwargs will be passed to `Figure.subplots()`.
+    """
+    figure = new_figure(rc, **(figure_kw or {}))
+    with rc_scope(figure):
+        axes = figure.subplots(nrows, ncols, **kwargs)
+    return figure, axes
 
 
 # size-related
@@ -191,15 +234,21 @@ def set_figuresize_by_subplots(alignment=None, subplot_width=5, subplot_height=4
     figure.set_size_inches(x*s * subplot_width + padding_width, y*s * subplot_height + padding_height)
 
 
-def render_resized(filename:Optional[str]=None, show:Optional[bool]=None, dpi:Optional[int]=None, aspect:Optional[float]=None, transparent:bool=False,
-                   figure:Optional[Figure]=None, tight_layout=True, **kwargs):
+def render_resized(filename:Union[str,list,None]=None, show:Optional[bool]=None, dpi:Optional[int]=None, aspect:Optional[float]=None, transparent:bool=False,
+                   figure:Optional[Figure]=None, tight_layout=True, concurrent:bool=False, background:bool=False, 
+                   processes:Optional[int]=None, **kwargs):
     """ Shorthand for `set_subplot_aspect()`, `set_figuresize_by_subplots()`, `plt.tight_figure()` and rendering.
 
-    filename: str,None. The file to save. If `None` and show==`None`, will call `plt.show()`.
+    filename: str,list,None. The file(s) to save. If `None` and show==`None`, will call `plt.show()`. Multiple files (e.g. png + pdf)
+        are saved with a single layout and a single raster rendering, see `save_figure()`.
     show: Controls whether to show the figure. Only applies when `filename != None`.
     dpi: The figure dpi.
     aspect: The subplot aspect. Defaults to 0.6 for a single subplot, and 0.8 for other cases.
     tight_layout: Whether to call `tight_layout()` for rendering, in the case when constrained layout is not used.
+    concurrent: Whether to write multiple files concurrently.
+    background: Whether to save in the background (see `save_figure_async()`), so the figure is shown without waiting for the 
+        file writing. Returns a Future in this case.
+    processes: Rasterize the subplots in parallel with this number of processes, useful for large grids of dense subplots.
 
     Also when there is only a single subplot, the subfig_width defaults to 6 instead of 5.
     
@@ -222,16 +271,23 @@ def render_resized(filename:Optional[str]=None, show:Optional[bool]=None, dpi:Op
     set_figuresize_by_subplots(**kwargs1, figure=figure)
 
     if tight_layout and not figure.get_constrained_layout():
-        plt.tight_layout()
+        with rc_scope(figure):
+            figure.tight_layout()
 
+    job = None
     if filename is not None:
-        plt.savefig(filename, dpi=dpi, transparent=transparent)
+        if background:
+            job = save_figure_async(figure, filename, dpi=dpi, transparent=transparent)
+        else:
+            save_figure(figure, filename, dpi=dpi, transparent=transparent, concurrent=concurrent, processes=processes)
 
     if filename is None or show:
         if dpi:
             figure.set_dpi(dpi)
         plt.show()
 
+    return job
+
 
 # axis formatting
 
@@ -361,15 +417,20 @@ def set_border(axes:Optional[Axes]=None, visible:Union[bool,str]='full', linewid
         axes.xaxis.set_visible(False)
         axes.yaxis.set_visible(False)
 
-def set_xylabel(xlabel, ylabel, **kwargs):
+def set_xylabel(xlabel, ylabel, axes:Optional[Axes]=None, **kwargs):
     """ Set x and y labels simutaneously.
     """
-    plt.xlabel(xlabel, **kwargs)
-    plt.ylabel(ylabel, **kwargs)
+    if axes is None:
+        axes = plt.gca()
+
+    with rc_scope(axes):
+        axes.set_xlabel(xlabel, **kwargs)
+        axes.set_ylabel(ylabel, **kwargs)
 
 # widgets
 
-def legend(*args, axes=None, box:bool=False, column=None, row=None, linewidth:float=0.5, loc:str='best', axis_padding:float=0, **kwargs):
+def legend(*args, axes=None, box:bool=False, column=None, row=None, linewidth:float=0.5, loc:str='best', axis_padding:float=0, 
+           max_vertices:Optional[int]=100000, **kwargs):
     """ A drop-in replacement for `plt.legend()`.
     
     By default, the box is not shown. If `box=True`, then (by default) will show a thin square box instead
@@ -380,6 +441,9 @@ def legend(*args, axes=None, box:bool=False, column=None, row=None, linewidth:fl
     linewidth: Linewidth of the legend box;
     loc: Location of the legend. In addition to the default choices, 'outleft, outright, outlower outupper' are also valid for a legend out of subplot.
     axis_padding: For legends out of subplot, specify the padding distance to the subplot.
+    max_vertices: For loc='best' on plots with more vertices than this, the location is estimated from a coarse
+        density grid built from at most `max_vertices` vertices, instead of the exhaustive search of matplotlib.
+        'fast' will always use the estimation. `None` disables the estimation.
     """
 
     if axes is None:
@@ -387,6 +451,10 @@ def legend(*args, axes=None, box:bool=False, column=None, row=None, linewidth:fl
 
     kwargs1 = kwargs.copy()
     
+    fast = loc == 'fast' or (loc == 'best' and max_vertices is not None and _count_vertices(axes) > max_vertices)
+    if loc == 'fast':
+        loc = 'best'
+
     kwargs1.setdefault('frameon', box)
     kwargs1.setdefault('framealpha', 0 if not box else 1)
     if column:
@@ -409,14 +477,128 @@ def legend(*args, axes=None, box:bool=False, column=None, row=None, linewidth:fl
 
     kwargs1['loc'] = loc
     
-    l = axes.legend(*args, **kwargs1)
+    with rc_scope(axes):
+        l = axes.legend(*args, **kwargs1)
     if box:
         frame = l.get_frame()
         frame.set_linewidth(linewidth)
         frame.set_edgecolor('black')
+    if fast:
+        # the location is still determined in drawing, when the final layout is known. A partial keeps the figure picklable.
+        l._find_best_position = partial(_find_legend_position, l, max_vertices=max_vertices or 100000)
     return l
 
 
+def _collection_size(c):
+    from matplotlib.collections import QuadMesh
+
+    if isinstance(c, QuadMesh):     # get_paths() would build a path per cell
+        ny, nx = c.get_coordinates().shape[:2]
+        return (ny - 1) * (nx - 1)
+    return max(len(c.get_offsets()), len(c.get_paths()))
+
+
+def _count_vertices(axes:Axes):
+    return sum(len(l.get_xydata()) for l in axes.lines) + \
+        sum(_collection_size(c) for c in axes.collections) + \
+        sum(im.get_array().size for im in axes.images if im.get_array() is not None)
+
+
+def _mesh_centers(artist):
+    """ The centers of unmasked cells of an image or a QuadMesh, in data coordinates.
+    """
+    import numpy as np
+    from matplotlib.collections import QuadMesh
+
+    arr = artist.get_array()
+    if arr is None:
+        return np.zeros((0, 2))
+    if isinstance(artist, QuadMesh):
+        c = artist.get_coordinates()
+        xy = (c[:-1, :-1] + c[1:, 1:]) / 2
+    else:
+        l, r, b, t = artist.get_extent()
+        ny, nx = arr.shape[:2]
+        x = l + (np.arange(nx) + 0.5) * (r - l) / nx
+        y = b + (np.arange(ny) + 0.5) * (t - b) / ny
+        if artist.origin == 'upper':
+            y = y[::-1]
+        xy = np.stack(np.meshgrid(x, y), axis=-1)
+    mask = np.ma.getmaskarray(arr)
+    if mask.ndim == 3:  # RGB(A) images
+        mask = mask.all(axis=-1)
+    mask = mask.reshape(xy.shape[:2])
+    return xy[~mask]
+
+
+def _legend_density_grid(axes:Axes, parentbbox, max_vertices:int, grid:int):
+    """ Estimate the occupancy of lines and points on a (grid, grid) mesh over parentbbox.
+    """
+    import numpy as np
+
+    lines = [l for l in axes.lines if l.get_visible()]
+    nvert = sum(len(l.get_xydata()) for l in lines)
+    stride = max(1, nvert // max_vertices)
+    scale = np.array([grid / parentbbox.width, grid / parentbbox.height])
+
+    pts = []
+    for l in lines:
+        xy = l.get_transform().transform(l.get_xydata()[::stride])
+        xy = (xy - [parentbbox.x0, parentbbox.y0]) * scale
+        xy = xy[np.isfinite(xy).all(axis=1)]
+        if l.get_linestyle() not in ('None', '', ' ') and len(xy) > 1:
+            # sample along the segments, so long segments crossing a cell are counted
+            nstep = np.minimum(np.ceil(np.abs(np.diff(xy, axis=0)).max(axis=1)), 2*grid).astype(int) + 1
+            if nstep.sum() <= max_vertices:
+                t = np.arange(nstep.sum()) - np.repeat(np.cumsum(nstep) - nstep, nstep)
+                t = (t / np.repeat(nstep, nstep))[:, None]
+                xy = np.repeat(xy[:-1], nstep, axis=0) * (1 - t) + np.repeat(xy[1:], nstep, axis=0) * t
+        pts.append(xy)
+    from matplotlib.collections import QuadMesh
+    for im in [im for im in axes.images if im.get_visible()] + [c for c in axes.collections if isinstance(c, QuadMesh) and c.get_visible()]:
+        xy = _mesh_centers(im)
+        xy = axes.transData.transform(xy[::max(1, len(xy) // max_vertices)])
+        pts.append((xy - [parentbbox.x0, parentbbox.y0]) * scale)
+    for c in axes.collections:
+        offsets = np.asarray(c.get_offsets())
+        if c.get_visible() and len(offsets) and not isinstance(c, QuadMesh):
+            xy = c.get_offset_transform().transform(offsets[::max(1, len(offsets) // max_vertices)])
+            pts.append((xy - [parentbbox.x0, parentbbox.y0]) * scale)
+
+    counts = np.zeros((grid, grid))
+    if pts:
+        xy = np.concatenate(pts).astype(int)
+        xy = xy[((xy >= 0) & (xy < grid)).all(axis=1)]
+        counts += np.bincount(xy[:, 0] * grid + xy[:, 1], minlength=grid*grid).reshape(grid, grid)
+    return counts
+
+
+def _find_legend_position(legend, width, height, renderer, max_vertices:int, grid:int=32):
+    """ A replacement of `Legend._find_best_position()`, that scores the candidates with a density grid.
+    """
+    import numpy as np
+    from matplotlib.transforms import Bbox
+
+    parentbbox = legend.get_bbox_to_anchor()
+    counts = _legend_density_grid(legend.axes, parentbbox, max_vertices, grid)
+    integral = np.zeros((grid+1, grid+1))
+    integral[1:, 1:] = counts.cumsum(0).cumsum(1)
+
+    bbox = Bbox.from_bounds(0, 0, width, height)
+    candidates = []
+    for idx in range(1, len(legend.codes)):
+        l, b = legend._get_anchored_bbox(idx, bbox, parentbbox, renderer)
+        x0, x1 = np.clip(np.array([l, l + width]) - parentbbox.x0, 0, parentbbox.width) / parentbbox.width * grid
+        y0, y1 = np.clip(np.array([b, b + height]) - parentbbox.y0, 0, parentbbox.height) / parentbbox.height * grid
+        i0, i1, j0, j1 = int(x0), int(np.ceil(x1)), int(y0), int(np.ceil(y1))
+        badness = integral[i1, j1] - integral[i0, j1] - integral[i1, j0] + integral[i0, j0]
+        candidates.append((badness, idx, (l, b)))
+        if badness == 0:
+            break
+
+    return min(candidates)[2]
+
+
 def plot_subplot_labels(position:Union[str,tuple,list,dict]='upper right', formatter='(%s)', padding=(0.02, 0.02), figure:Optional[Figure]=None, axes=None, **kwargs):
     """ Adding labels to subplots.
 
@@ -467,37 +649,143 @@ def plot_subplot_labels(position:Union[str,tuple,list,dict]='upper right', forma
             l, b, halign, valign = pos[j]
         elif mode == 2:
             l, b, halign, valign = pos.get(j+1, default_pos)
-        texts.append(a.text(l, b, formatter % (chr(j+97)), horizontalalignment=halign, verticalalignment=valign, transform=a.transAxes, **kwargs))
+        with rc_scope(a):
+            texts.append(a.text(l, b, formatter % (chr(j+97)), horizontalalignment=halign, verticalalignment=valign, transform=a.transAxes, **kwargs))
 
     return texts
 
 # coloring
+# Palettes are memoized with bounded caches, as they are requested again for every axes. Cached palettes are tuples
+# (or read-only arrays), and public functions return copies.
 
 
-def get_colors(name:str='default', step:Union[int, float]=0.4):
-    """ Get the colors from a colormap. For continuous colormaps, will refer to step for discretization.
-
-    step: float/int. Either the number of steps, or the step size.
-    """
+@lru_cache(maxsize=256)
+def _get_colors(name:str, step:Union[int, float]):
     from math import ceil
-    cm = plt.get_cmap(name)
+    import numpy as np
+
+    cm = matplotlib.colormaps[name]
     if isinstance(cm, colors.LinearSegmentedColormap) or name in ('viridis', 'plasma', 'inferno', 'magma', 'cividis'):
         if isinstance(step, int):
-            return [cm(x/(step-1)) for x in range(step)]
+            x = np.arange(step) / (step-1)
         else:
-            return [cm(x*step) for x in range(ceil(1/step))]
+            x = np.arange(ceil(1/step)) * step
+        return tuple(map(tuple, cm(x).tolist()))    # sampling all steps in one call
     else:
-        return cm.colors
+        return _as_palette(cm.colors)
+
+
+def get_colors(name:str='default', step:Union[int, float]=0.4):
+    """ Get the colors from a colormap. For continuous colormaps, will refer to step for discretization.
+
+    step: float/int. Either the number of steps, or the step size.
+    """
+    return list(_get_colors(name, step))
 
 
 name2color = colors.to_rgb
 
+
+def rgb_to_hls(rgb):
+    """ Vectorized `colorsys.rgb_to_hls()`. rgb: array of (..., 3). Returns array of (..., 3).
+    """
+    import numpy as np
+
+    rgb = np.asarray(rgb, dtype=float)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    maxc = rgb.max(axis=-1)
+    minc = rgb.min(axis=-1)
+    sumc = maxc + minc
+    rangec = maxc - minc
+    l = sumc / 2
+    gray = rangec == 0
+    rangec_ = np.where(gray, 1, rangec)
+
+    s = np.where(l <= 0.5, rangec / np.where(gray, 1, sumc), rangec / np.where(gray, 1, 2 - sumc))
+    rc, gc, bc = (maxc - r) / rangec_, (maxc - g) / rangec_, (maxc - b) / rangec_
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2 + rc - bc, 4 + gc - rc))
+    h = (h / 6) % 1
+    return np.stack([np.where(gray, 0, h), l, np.where(gray, 0, s)], axis=-1)
+
+
+def hls_to_rgb(hls):
+    """ Vectorized `colorsys.hls_to_rgb()`. hls: array of (..., 3). Returns array of (..., 3).
+    """
+    import numpy as np
+
+    hls = np.asarray(hls, dtype=float)
+    h, l, s = hls[..., 0], hls[..., 1], hls[..., 2]
+    m2 = np.where(l <= 0.5, l * (1 + s), l + s - l * s)
+    m1 = 2 * l - m2
+
+    def _v(hue):
+        hue = hue % 1
+        return np.select([hue < 1/6, hue < 0.5, hue < 2/3], [m1 + (m2 - m1) * hue * 6, m2, m1 + (m2 - m1) * (2/3 - hue) * 6], m1)
+
+    rgb = np.stack([_v(h + 1/3), _v(h), _v(h - 1/3)], axis=-1)
+    return np.where((s == 0)[..., None], l[..., None], rgb)
+
+
+def lighten_colors(colors, offset:float=0.25):
+    """ Vectorized `lighten_color()`. colors: A list of colors (names or RGB(A) tuples). Returns array of (ncolors, 3).
+    """
+    import numpy as np
+
+    rgb = np.array([name2color(c) for c in colors]).reshape(-1, 3)
+    hls = rgb_to_hls(rgb)
+    hls[:, 1] = np.minimum(hls[:, 1] + offset, 1.0)
+    return hls_to_rgb(hls)
+
+
 def lighten_color(r, g, b, offset:float=0.25):
     """ Return a lighter version of the color.
     offset: the improvement of the lighting scale.
     """
-    h, l, s = colorsys.rgb_to_hls(r, g, b)
-    return colorsys.hls_to_rgb(h, min(l+offset, 1.0), s)
+    return tuple(lighten_colors([(r, g, b)], offset)[0].tolist())
+
+
+@lru_cache(maxsize=128)
+def _get_shades(name:str, n:int, lightness:tuple, skip_header:bool):
+    import numpy as np
+
+    rgb = np.array([name2color(c) for c in _get_colors(name, 0.4)])
+    if skip_header and name.startswith('line.'):
+        rgb = rgb[1:]
+    hls = np.repeat(rgb_to_hls(rgb)[:, None, :], n, axis=1)
+    hls[:, :, 1] = np.clip(hls[:, :, 1] + np.linspace(*lightness, n), 0, 1)
+    shades = hls_to_rgb(hls)
+    shades.flags.writeable = False
+    return shades
+
+
+def get_shades(name:str='line.default', n:int=3, lightness:tuple=(-0.2, 0.2), skip_header:bool=True):
+    """ Generate `n` shades of each color in a colormap, by shifting the HLS lightness. Returns array of (ncolors, n, 3).
+    For example, `get_shades('line.default', 3)[:, 0]` are the darker variants, and `[:, 2]` are the lighter ones.
+
+    lightness: (min, max) offsets of lightness, evenly spaced over the shades.
+    skip_header: Skips the first color of `line.` colormaps (see `set_prop_cycle()`).
+    """
+    return _get_shades(name, n, tuple(lightness), skip_header).copy()
+
+
+def _as_palette(colors):
+    """ Convert a list of colors to a hashable tuple.
+    """
+    return tuple(c if isinstance(c, str) else tuple(c) for c in colors)
+
+
+def _loop_list(l, length):
+    return l * (length // len(l)) + l[:(length % len(l))]
+
+
+@lru_cache(maxsize=128)
+def _color_cycler(colors:tuple, marker_colors:Optional[tuple]):
+    from cycler import cycler
+
+    if marker_colors:
+        return cycler(color=colors, mfc=_loop_list(marker_colors, len(colors)))
+    else:
+        return cycler(color=colors)
 
 
 def set_prop_cycle(axes:Optional[Axes]=None, colormap:Union[list,str]='line.default', marker_colormap:Optional[str]=None, 
@@ -517,33 +805,30 @@ def set_prop_cycle(axes:Optional[Axes]=None, colormap:Union[list,str]='line.defa
     if axes is None:
         axes = plt.gca()
 
-    def _loop_list(l, length):
-        return l * (length // len(l)) + l[:(length % len(l))]
-
     if isinstance(colormap, str):
-        colors = get_colors(colormap)
+        colors = _get_colors(colormap, 0.4)
     else:
-        colors = colormap
+        colors = _as_palette(colormap)
 
     if skip_header and isinstance(colormap, str) and colormap.startswith('line.'):
         colors = colors[1:]
 
-    if marker_colormap:
+    marker_colors = None
+    if marker_colormap is not None and len(marker_colormap):
         if isinstance(marker_colormap, str):
-            marker_colors = get_colors(marker_colormap)
+            marker_colors = _get_colors(marker_colormap, 0.4)
             if skip_header and marker_colormap.startswith('line.'):
                 marker_colors = marker_colors[1:]
         else:
-            marker_colors = marker_colormap
-        color_cycler = cycler(color=colors, mfc=_loop_list(marker_colors, len(colors)))
-    else:
-        color_cycler = cycler(color=colors)
+            marker_colors = _as_palette(marker_colormap)
+
+    color_cycler = _color_cycler(colors, marker_colors)
 
     if not kwargs:
         axes.set_prop_cycle(color_cycler)
     else:
         if combination == '+':
-            ex_cycler = cycler(**{k: _loop_list(v, len(colors)) for k, v in kwargs.items()})
+            ex_cycler = cycler(**{k: _loop_list(list(v), len(colors)) for k, v in kwargs.items()})
             axes.set_prop_cycle(color_cycler + ex_cycler)
         elif combination == '*':
             ex_cycler = cycler(**kwargs)
@@ -558,7 +843,143 @@ def skip_lineprop(axes=None):
     if axes is None:
         axes = plt.gca()
 
-    next(axes._get_lines.prop_cycler)
+    if hasattr(axes._get_lines, 'prop_cycler'):
+        next(axes._get_lines.prop_cycler)
+    else:   # matplotlib >= 3.8
+        axes._get_lines.get_next_color()
+
+
+def _density_transform(scale:str):
+    import numpy as np
+    return np.log10 if scale == 'log' else (lambda x: x)
+
+
+def get_density_extent(chunks, xscale:str='linear', yscale:str='linear'):
+    """ Get the (xlim, ylim) of data given by an iterable of (x, y) chunks. Non-positive values are ignored for log scales.
+    """
+    import numpy as np
+
+    lo = np.array([np.inf, np.inf])
+    hi = -lo
+    for x, y in chunks:
+        for j, (v, scale) in enumerate(((x, xscale), (y, yscale))):
+            v = np.asarray(v, dtype=float).ravel()
+            v = v[np.isfinite(v) & (v > 0)] if scale == 'log' else v[np.isfinite(v)]
+            if len(v):
+                lo[j] = min(lo[j], v.min())
+                hi[j] = max(hi[j], v.max())
+
+    return (lo[0], hi[0]), (lo[1], hi[1])
+
+
+def density_histogram(chunks, bins:tuple, xlim:tuple, ylim:tuple, xscale:str='linear', yscale:str='linear'):
+    """ Bin points into a 2D histogram, one chunk at a time.
+
+    chunks: Iterable of (x, y). `y` may be 2D (npoints, ncols), then a histogram is built for each column.
+    bins: (nx, ny).
+    xlim, ylim: The range of histogram. For log scales, the bins are uniform in the log space.
+
+    Returns counts in shape (ny, nx), or (ncols, ny, nx) if `y` is 2D.
+    """
+    import numpy as np
+
+    nx, ny = bins
+    fx, fy = _density_transform(xscale), _density_transform(yscale)
+    x0, x1 = fx(np.asarray(xlim, dtype=float))
+    y0, y1 = fy(np.asarray(ylim, dtype=float))
+
+    counts = None
+    for x, y in chunks:
+        y = np.asarray(y, dtype=float)
+        if counts is None:
+            ndim = y.ndim
+            counts = np.zeros((1 if ndim == 1 else y.shape[1], ny * nx), dtype=np.int64)
+        y = y.reshape(len(y), -1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ix = np.floor((fx(np.asarray(x, dtype=float)) - x0) * (nx / (x1 - x0)))
+            iy = np.floor((fy(y) - y0) * (ny / (y1 - y0)))
+
+        for j in range(y.shape[1]):
+            m = (ix >= 0) & (ix < nx) & (iy[:, j] >= 0) & (iy[:, j] < ny)
+            counts[j] += np.bincount((iy[m, j] * nx + ix[m]).astype(np.intp), minlength=ny * nx)
+
+    if counts is None:
+        raise ValueError('No data')
+    counts = counts.reshape(-1, ny, nx)
+    return counts if ndim > 1 else counts[0]
+
+
+def plot_density(x, y=None, axes:Optional[Axes]=None, color=None, colormap:Optional[str]=None, bins:Optional[tuple]=None,
+                 xlim:Optional[tuple]=None, ylim:Optional[tuple]=None, label=None, **kwargs):
+    """ Plot points as a density image rather than individual markers. Much faster than `plot()` for millions of points.
+
+    x, y: The coordinates. `y` may be 2D for multiple columns. If `y` is `None`, `x` is an iterable of (x, y) chunks, so that data
+        larger than memory can be streamed; `xlim` and `ylim` must be given unless it is a list (see `get_density_extent()`).
+    color: The color of each column, where the density is shown by opacity. Defaults to the next colors in the property cycle.
+    colormap: Name of a colormap (e.g. 'viridis' or a `line.` colormap) used instead of `color`.
+    bins: (nx, ny). Defaults to the pixel size of the axes.
+    xlim, ylim: The range of histogram. Defaults to the data range. Log scales of the axes are respected.
+    label: str or list of str. The label of each column, shown in legend.
+
+    Additional kwargs will be passed to `imshow()` (or `pcolormesh()` for log scales).
+    Returns the list of images.
+    """
+    import numpy as np
+
+    if axes is None:
+        axes = plt.gca()
+
+    xscale, yscale = axes.get_xscale(), axes.get_yscale()
+    chunks = [(x, y)] if y is not None else x
+    if xlim is None or ylim is None or None in xlim or None in ylim:
+        if not isinstance(chunks, (list, tuple)):
+            raise ValueError('xlim and ylim must be given for streamed data')
+        xlim0, ylim0 = get_density_extent(chunks, xscale, yscale)
+        xlim = xlim0 if xlim is None else tuple(d if v is None else v for v, d in zip(xlim, xlim0))
+        ylim = ylim0 if ylim is None else tuple(d if v is None else v for v, d in zip(ylim, ylim0))
+    if bins is None:
+        bbox = axes.get_window_extent()
+        bins = (max(int(bbox.width), 1), max(int(bbox.height), 1))
+
+    counts = density_histogram(chunks, bins, xlim, ylim, xscale, yscale)
+    if counts.ndim == 2:
+        counts = counts[None]
+
+    labels = label if isinstance(label, (list, tuple)) else [label] * len(counts)
+    ex, ey = np.linspace(*_density_transform(xscale)(np.asarray(xlim, dtype=float)), bins[0]+1), \
+        np.linspace(*_density_transform(yscale)(np.asarray(ylim, dtype=float)), bins[1]+1)
+    if xscale == 'log':
+        ex = 10**ex
+    if yscale == 'log':
+        ey = 10**ey
+
+    images = []
+    for j, c in enumerate(counts):
+        if colormap is not None:
+            cmap = matplotlib.colormaps[colormap].copy()
+            color_ = cmap(1.0)
+        else:
+            color_ = axes._get_lines.get_next_color() if color is None else \
+                (color[j] if isinstance(color, (list, tuple)) and not isinstance(color[0], (int, float)) else color)
+            cmap = colors.LinearSegmentedColormap.from_list('', [colors.to_rgba(color_, 0.15), colors.to_rgba(color_, 1)])
+        cmap.set_bad(alpha=0)
+
+        c = np.ma.masked_equal(c, 0)
+        norm = colors.LogNorm(1, max(c.max(), 2)) if c.count() else None
+        with rc_scope(axes):
+            if xscale == 'log' or yscale == 'log':
+                im = axes.pcolormesh(ex, ey, c, cmap=cmap, norm=norm, rasterized=True, **kwargs)
+            else:
+                kwargs1 = kwargs.copy()
+                kwargs1.setdefault('interpolation', 'nearest')
+                im = axes.imshow(c, extent=(ex[0], ex[-1], ey[0], ey[-1]), origin='lower', aspect='auto', cmap=cmap, norm=norm, **kwargs1)
+            images.append(im)
+
+            if labels[j] is not None:   # images are not shown in legend
+                from matplotlib.lines import Line2D
+                axes.add_line(Line2D([], [], color=color_, marker='s', linestyle='None', label=labels[j]))
+
+    return images
 
 
 # misc
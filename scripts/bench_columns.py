@@ -0,0 +1,90 @@
+""" Benchmark of column selection on wide text files: time and peak memory of `parse_cols()` plus the per-column access
+of the plotting loop, for a few selections. The DataFrame based selection of earlier versions is measured as the baseline.
+
+Usage: python scripts/bench_columns.py [nrows] [ncols]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from lineutil.data import read_dat
+from lineutil.__main__ import parse_cols
+
+
+def parse_cols_baseline(x:str, y:str, data:pd.DataFrame):
+    """ The DataFrame based selection of earlier versions.
+    """
+    def parse_cols1(x):
+        v = int(x)
+        return data.index if v == 0 else data.iloc[:, v-1]
+
+    xcol = parse_cols1(x)
+    if ':' in y:
+        start, end = y.split(':')
+        vstart = 0 if start == '' else int(start)-1
+        vend = data.shape[1] if end == '' else int(end)-1
+        ycol = data.iloc[:, vstart:vend]
+    else:
+        ycol = pd.DataFrame({y_: parse_cols1(y_) for y_ in y.split(',')})
+    return xcol, ycol
+
+
+def select(data, x:str, y:str):
+    xcol, ycol, _, _ = parse_cols(x, y, data)
+    s = 0.
+    for c in ycol:
+        s += c[0]
+
+
+def select_baseline(data, x:str, y:str):
+    xcol, ycol = parse_cols_baseline(x, y, data)
+    s = 0.
+    for j in range(ycol.shape[1]):
+        s += np.asarray(ycol.iloc[:, j])[0]
+
+
+def bench(func, data, x:str, y:str):
+    """ Returns time and peak memory. They are measured in separate runs, as tracing slows down allocations.
+    """
+    t = time.perf_counter()
+    func(data, x, y)
+    dt = time.perf_counter() - t
+
+    tracemalloc.start()
+    func(data, x, y)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return dt, peak
+
+
+def main():
+    nrows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    ncols = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+
+    with tempfile.TemporaryDirectory() as d:
+        filename = os.path.join(d, 'wide.dat')
+        np.savetxt(filename, np.random.rand(nrows, ncols), fmt='%.6g', header=' '.join('c%d' % j for j in range(ncols)), comments='')
+        data = read_dat(filename)
+
+    print('%d rows x %d columns' % (nrows, ncols))
+    cases = [
+        ('1', '2'),
+        ('1', '2:12'),
+        ('1', '2:'),
+        ('1', ','.join(str(j) for j in range(2, ncols+1, 2))),
+    ]
+    print('%-20s %20s %20s' % ('', 'baseline', 'parse_cols'))
+    for x, y in cases:
+        result = ['%8.3fs %8.1fMB' % (dt, peak / 1e6) for dt, peak in (bench(f, data, x, y) for f in (select_baseline, select))]
+        print('-x %s -y %-12s %20s %20s' % (x, y if len(y) <= 12 else y[:9] + '...', *result))
+
+
+if __name__ == '__main__':
+    main()
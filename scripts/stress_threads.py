@@ -0,0 +1,74 @@
+""" Stress test of the pyplot-free API in threads: figures with different presets are built and saved concurrently,
+and compared pixel by pixel with serial renders. The global rcParams must be left untouched.
+
+Usage: python scripts/stress_threads.py [nfigures] [nthreads] [rounds]
+"""
+
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import matplotlib
+matplotlib.use('agg')
+from matplotlib import image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import lineutil
+
+
+def make_rc(j:int):
+    rc = {}
+    [lambda rc: None, lineutil.preset_prl, lineutil.preset_nature][j % 3](rc=rc)
+    return rc
+
+
+def build(j:int, filename:str):
+    """ Build and save the j-th figure.
+    """
+    rng = np.random.default_rng(j)
+    rc = make_rc(j)
+    fig, axes = lineutil.subplots(1 + j % 2, 2, rc=rc, squeeze=False)
+    for k, ax in enumerate(axes.flat):
+        lineutil.set_prop_cycle(ax, colormap=['line.default', 'line.vivid', 'line.contrast1'][(j + k) % 3])
+        with lineutil.rc_scope(fig):
+            for n in range(3):
+                ax.plot(np.cumsum(rng.standard_normal(200)), label='line %d' % n)
+        lineutil.set_xylabel('x', 'y', axes=ax)
+        lineutil.legend(axes=ax)
+    lineutil.plot_subplot_labels(axes=axes.flat)
+    lineutil.render_resized(filename, figure=fig)
+
+
+def main():
+    nfigure = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    nthread = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    nround = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    rc0 = dict(matplotlib.rcParams)
+    failed = 0
+    with tempfile.TemporaryDirectory() as d:
+        for j in range(nfigure):
+            build(j, os.path.join(d, 'serial-%d.png' % j))
+        expected = [image.imread(os.path.join(d, 'serial-%d.png' % j)) for j in range(nfigure)]
+
+        for r in range(nround):
+            with ThreadPoolExecutor(nthread) as pool:
+                list(pool.map(lambda j: build(j, os.path.join(d, 'thread-%d.png' % j)), range(nfigure)))
+            for j in range(nfigure):
+                if not np.array_equal(expected[j], image.imread(os.path.join(d, 'thread-%d.png' % j))):
+                    print('round %d: figure %d differs from the serial render' % (r, j))
+                    failed += 1
+
+    changed = [k for k, v in matplotlib.rcParams.items() if k in rc0 and not np.array_equal(np.asarray(v, dtype=object), np.asarray(rc0[k], dtype=object))]
+    if changed:
+        print('global rcParams changed:', changed)
+        failed += 1
+
+    print('%d figures x %d rounds in %d threads: %s' % (nfigure, nround, nthread, 'FAILED' if failed else 'OK'))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()